@@ -26,22 +26,31 @@ try:
 except ImportError:
     __version__ = 'unset'
 
-import os
+import copy
 from xml.etree import cElementTree as ElementTree
 
 from keymint_package.xml.defaults import set_defaults
-
-import xmlschema
+from keymint_package.xml.loader import get_file_cache
+from keymint_package.xml.loader import map_file
+from keymint_package.xml.loader import parse_buffer
 
 PACKAGE_MANIFEST_FILENAME = 'keymint_package.xml'
 
 
-def parse_package(path):
+def parse_package(path, *, copy_documents=False):
     """
     Parse package manifest.
 
+    Referenced documents are read through the process-wide cache returned by
+    :func:`keymint_package.xml.loader.get_file_cache`.  A cached document is
+    re-read once its file changes and dropped once its file is removed, but
+    is otherwise kept for the life of the process; long running tools can
+    call ``get_file_cache().clear()`` to release the memory.
+
     :param path: The path of the keymint_package.xml file, it may or may not
     include the filename
+    :param copy_documents: give the package private copies of the referenced
+    documents, see :func:`parse_package_string`
 
     :returns: return :class:`Package` instance, populated with parsed fields
     :raises: :exc:`InvalidPackage`
@@ -62,9 +71,10 @@ def parse_package(path):
         raise IOError("Path '%s' is neither a directory containing a '%s' "
                       'file nor a file' % (path, PACKAGE_MANIFEST_FILENAME))
 
-    with open(filename, 'r', encoding='utf-8') as f:
+    with map_file(filename) as data:
         try:
-            return parse_package_string(f.read(), path, filename=filename)
+            return parse_package_string(
+                data, path, filename=filename, copy_documents=copy_documents)
         except InvalidPackage as e:
             e.args = [
                 "Invalid package manifest '%s': %s" %
@@ -100,23 +110,86 @@ def check_schema(schema, data, filename=None):
             raise InvalidPackage(msg + str(ex))
 
 
-def parse_package_string(data, path, *, filename=None):
+def load_document(file_cache, schema_name, path, element, path_tag, *,
+                  copy_document=False):
+    """
+    Load a document referenced from the manifest and apply its defaults.
+
+    :param file_cache: :class:`FileCache` used to read the files
+    :param schema_name: name of the schema the document is validated
+    against, ``str``
+    :param path: base path of the package, ``str``
+    :param element: manifest element referencing the document
+    :param path_tag: tag of the child holding the document path, ``str``
+    :param copy_document: return a private copy of the document even if no
+    defaults are applied, ``bool``
+    :returns: root element of the document, shared with other packages
+    unless defaults were applied or ``copy_document`` is set, a shared root
+    must not be modified
+    :raises: :exc:`InvalidPackage`
+    """
+    from .schemas import get_package_schema
+
+    schema = get_package_schema(schema_name)
+    document_path = file_cache.resolve(path, element.find(path_tag).text)
+    document_root = file_cache.parse(document_path)
+    if element.find('defaults_path') is not None:
+        defaults_path = file_cache.resolve(path, element.find('defaults_path').text)
+        defaults_root = file_cache.parse(defaults_path)
+        document_root = set_defaults(
+            schema, copy.deepcopy(document_root), defaults_root)
+        check_schema(schema, document_root, document_path)
+        return document_root
+    if not file_cache.is_valid(document_path, document_root, schema_name):
+        check_schema(schema, document_root, document_path)
+        file_cache.set_valid(document_path, document_root, schema_name)
+    if copy_document:
+        document_root = copy.deepcopy(document_root)
+    return document_root
+
+
+def parse_package_string(data, path, *, filename=None, file_cache=None, stages=None,
+                         copy_documents=False):
     """
     Parse keymint_package.xml string contents.
 
-    :param data: keymint_package.xml contents, ``str``
+    :param data: keymint_package.xml contents, ``str`` or bytes-like;
+    bytes-like contents are parsed in place and decoded once for
+    ``Package.string`` with newlines translated like a file read in text mode
     :param filename: full file path for debugging, ``str``
-    :returns: return parsed :class:`Package`
+    :param file_cache: :class:`FileCache` used to read referenced files,
+    defaults to the cache shared by all packages
+    :param stages: :class:`Stage` subclasses run on the merged elements,
+    defaults to the registered stages
+    :param copy_documents: give the package private copies of the referenced
+    documents instead of the ones shared through ``file_cache``, ``bool``
+    :returns: return parsed :class:`Package`, unless ``copy_documents`` is
+    set the elements of its ``permissions``, ``governance`` and
+    ``identities`` may be shared with other packages and must not be modified
     :raises: :exc:`InvalidPackage`
+    :raises: :exc:`InvalidStage` if the stages are malformed
+    :raises: :exc:`StageError` if a stage visitor fails
     """
     from .package import Package
-    from .schemas import get_package_schema_path
+    from .schemas import get_package_schema
+    from .stages import get_registered_stages
+    from .stages import StagePipeline
 
-    keymint_package_xsd_path = get_package_schema_path('keymint_package.xsd')
-    keymint_package_schema = xmlschema.XMLSchema(keymint_package_xsd_path)
+    if file_cache is None:
+        file_cache = get_file_cache()
+    if stages is None:
+        stages = get_registered_stages()
 
-    check_schema(keymint_package_schema, data, filename)
-    keymint_package_tree = ElementTree.ElementTree(ElementTree.fromstring(data))
+    keymint_package_schema = get_package_schema('keymint_package.xsd')
+
+    if isinstance(data, str):
+        check_schema(keymint_package_schema, data, filename)
+        keymint_package_tree = ElementTree.ElementTree(ElementTree.fromstring(data))
+    else:
+        keymint_package_root = parse_buffer(data)
+        check_schema(keymint_package_schema, keymint_package_root, filename)
+        keymint_package_tree = ElementTree.ElementTree(keymint_package_root)
+        data = str(data, 'utf-8').replace('\r\n', '\n').replace('\r', '\n')
 
     pkg = Package(filename=filename)
     pkg.string = data
@@ -142,60 +215,41 @@ def parse_package_string(data, path, *, filename=None):
     # name
     pkg.name = root.find('name').text
 
+    pipeline = StagePipeline(pkg, stages)
+
     permissions = root.find('permissions')
     if permissions is not None:
-        permissions_xsd_path = get_package_schema_path('permissions.xsd')
-        permissions_schema = xmlschema.XMLSchema(permissions_xsd_path)
         pkg.permissions = ElementTree.Element('permissions')
         for permission in permissions.findall('permission'):
-            permission_path = os.path.join(path, permission.find('permission_path').text)
-            permission_root = ElementTree.ElementTree(file=permission_path).getroot()
-            if permission.find('defaults_path') is not None:
-                defaults_path = os.path.join(
-                    path, permission.find('defaults_path').text)
-                defaults_root = ElementTree.ElementTree(file=defaults_path).getroot()
-                permission_root = set_defaults(
-                    permissions_schema, permission_root, defaults_root)
-            check_schema(permissions_schema, permission_root, permission_path)
+            permission_root = load_document(
+                file_cache, 'permissions.xsd', path, permission, 'permission_path',
+                copy_document=copy_documents)
             permission_elemts = permission_root.findall('permissions/grant')
+            pipeline.visit('grant', permission_elemts)
             pkg.permissions.extend(permission_elemts)
         pkg.permissions_ca = permissions.find('issuer_name')
 
     governances = root.find('governances')
     if governances is not None:
-        governances_xsd_path = get_package_schema_path('governance.xsd')
-        governances_schema = xmlschema.XMLSchema(governances_xsd_path)
         pkg.governance = ElementTree.Element('domain_access_rules')
         for governance in governances.findall('governance'):
-            governance_path = os.path.join(path, governance.find('governance_path').text)
-            governance_root = ElementTree.ElementTree(file=governance_path).getroot()
-            if governance.find('defaults_path') is not None:
-                defaults_path = os.path.join(
-                    path, governance.find('defaults_path').text)
-                defaults_root = ElementTree.ElementTree(file=defaults_path).getroot()
-                governance_root = set_defaults(
-                    governances_schema, governance_root, defaults_root)
-            check_schema(governances_schema, governance_root, governance_path)
+            governance_root = load_document(
+                file_cache, 'governance.xsd', path, governance, 'governance_path',
+                copy_document=copy_documents)
             governance_elemts = governance_root.findall('domain_access_rules/domain_rule')
+            pipeline.visit('domain_rule', governance_elemts)
             pkg.governance.extend(governance_elemts)
         pkg.governance_ca = governances.find('issuer_name')
 
     identities = root.find('identities')
     if identities is not None:
-        identities_xsd_path = get_package_schema_path('identities.xsd')
-        identities_schema = xmlschema.XMLSchema(identities_xsd_path)
         pkg.identities = ElementTree.Element('identities')
         for identity in identities.findall('identity'):
-            identity_path = os.path.join(path, identity.find('identity_path').text)
-            identity_root = ElementTree.ElementTree(file=identity_path).getroot()
-            if identity.find('defaults_path') is not None:
-                defaults_path = os.path.join(
-                    path, identity.find('defaults_path').text)
-                defaults_root = ElementTree.ElementTree(file=defaults_path).getroot()
-                identity_root = set_defaults(
-                    identities_schema, identity_root, defaults_root)
-            check_schema(identities_schema, identity_root, identity_path)
+            identity_root = load_document(
+                file_cache, 'identities.xsd', path, identity, 'identity_path',
+                copy_document=copy_documents)
             identity_elemts = identity_root.findall('identities/identity')
+            pipeline.visit('identity', identity_elemts)
             pkg.identities.extend(identity_elemts)
 
     # version
@@ -204,6 +258,8 @@ def parse_package_string(data, path, *, filename=None):
     # description
     pkg.description = root.findtext('description')
 
+    pkg.stage_results = pipeline.results()
+
     pkg.validate()
 
     return pkg
@@ -15,3 +15,11 @@
 
 class InvalidPackage(Exception):
     pass
+
+
+class InvalidStage(Exception):
+    pass
+
+
+class StageError(Exception):
+    pass
@@ -18,7 +18,14 @@ from .exceptions import InvalidPackage
 
 
 class Package:
-    """Object representation of a package manifest file."""
+    """
+    Object representation of a package manifest file.
+
+    The elements merged into ``permissions``, ``governance`` and
+    ``identities`` may be shared with other packages referencing the same
+    files and must be treated as read-only, unless the package was parsed
+    with ``copy_documents``.
+    """
 
     __slots__ = [
         'package_format',
@@ -34,6 +41,7 @@ class Package:
         'governance',
         'governance_ca',
         'identities',
+        'stage_results',
         'string',
         'tree',
         'export',
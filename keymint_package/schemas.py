@@ -15,9 +15,21 @@
 import os
 
 import pkg_resources
+import xmlschema
+
+_package_schemas = {}
 
 
 def get_package_schema_path(name):
     return pkg_resources.resource_filename(
         package_or_requirement='keymint_package',
         resource_name=os.path.join('schema', 'package', name))
+
+
+def get_package_schema(name):
+    try:
+        return _package_schemas[name]
+    except KeyError:
+        schema = xmlschema.XMLSchema(get_package_schema_path(name))
+        _package_schemas[name] = schema
+        return schema
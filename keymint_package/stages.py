@@ -0,0 +1,242 @@
+# Copyright 2017 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from .exceptions import InvalidStage
+from .exceptions import StageError
+
+ELEMENT_KINDS = ['grant', 'domain_rule', 'identity']
+
+
+class Stage:
+    """
+    Post-processing stage run while a package is parsed.
+
+    Subclasses set a unique ``name``, list the names of the stages they
+    depend on in ``depends`` and override the visitors they need.  The
+    visited elements may be shared with other packages and must not be
+    modified.
+    """
+
+    name = None
+    depends = ()
+
+    def __init__(self, pkg, dependencies):
+        """
+        Constructor.
+
+        :param pkg: the :class:`Package` being parsed
+        :param dependencies: stages this stage depends on by name, ``dict``
+        """
+        self.pkg = pkg
+        self.dependencies = dependencies
+
+    def visit_grant(self, element):
+        """Visit a ``grant`` element merged into ``pkg.permissions``."""
+        pass
+
+    def visit_domain_rule(self, element):
+        """Visit a ``domain_rule`` element merged into ``pkg.governance``."""
+        pass
+
+    def visit_identity(self, element):
+        """Visit an ``identity`` element merged into ``pkg.identities``."""
+        pass
+
+    def finish(self, results):
+        """
+        Return the result of the stage.
+
+        :param results: results of the stages this stage depends on by
+        name, ``dict``
+        :returns: result attached to the package
+        """
+        return None
+
+
+_stages = OrderedDict()
+
+
+def check_stage_class(stage_class):
+    """
+    Ensure that a stage class is well formed.
+
+    :param stage_class: :class:`Stage` subclass
+    :raises: :exc:`InvalidStage`
+    """
+    if not isinstance(stage_class, type) or not issubclass(stage_class, Stage):
+        raise InvalidStage('%r is not a Stage subclass' % (stage_class,))
+    if not stage_class.name:
+        raise InvalidStage("Stage '%s' does not declare a name" %
+                           stage_class.__name__)
+    if not isinstance(stage_class.depends, (list, tuple)):
+        raise InvalidStage("Stage '%s' must declare its dependencies as a "
+                           'list or tuple' % stage_class.name)
+
+
+def register_stage(stage_class):
+    """
+    Register a stage run for every parsed package.
+
+    Can be used as a class decorator.
+
+    :param stage_class: :class:`Stage` subclass
+    :returns: the registered class
+    :raises: :exc:`InvalidStage`
+    """
+    check_stage_class(stage_class)
+    if stage_class.name in _stages:
+        raise InvalidStage("A stage named '%s' is already registered" %
+                           stage_class.name)
+    _stages[stage_class.name] = stage_class
+    return stage_class
+
+
+def unregister_stage(name):
+    """
+    Unregister a previously registered stage.
+
+    :param name: name of the stage, ``str``
+    """
+    _stages.pop(name, None)
+
+
+def get_registered_stages():
+    """Return the registered stage classes in registration order."""
+    return list(_stages.values())
+
+
+def sort_stages(stage_classes):
+    """
+    Order stages so that every stage follows its dependencies.
+
+    :param stage_classes: :class:`Stage` subclasses
+    :returns: sorted list of stage classes
+    :raises: :exc:`InvalidStage`
+    """
+    by_name = OrderedDict()
+    for stage_class in stage_classes:
+        check_stage_class(stage_class)
+        if stage_class.name in by_name:
+            raise InvalidStage("Multiple stages are named '%s'" % stage_class.name)
+        by_name[stage_class.name] = stage_class
+    ordered = OrderedDict()
+    visiting = set()
+
+    def visit(name, dependent):
+        if name in ordered:
+            return
+        if name not in by_name:
+            raise InvalidStage("Stage '%s' depends on unknown stage '%s'" %
+                               (dependent, name))
+        if name in visiting:
+            raise InvalidStage("Stage '%s' has a circular dependency" % name)
+        visiting.add(name)
+        for dependency in by_name[name].depends:
+            visit(dependency, name)
+        visiting.remove(name)
+        ordered[name] = by_name[name]
+
+    for name in by_name:
+        visit(name, None)
+    return list(ordered.values())
+
+
+class StageResults(Mapping):
+    """
+    Stage results of a package, computed on first access.
+
+    Errors raised while computing a result are wrapped in
+    :exc:`StageError`, so they are not mistaken for missing stages.
+    """
+
+    def __init__(self, stages):
+        """
+        Constructor.
+
+        :param stages: stage instances by name, ``OrderedDict``
+        """
+        self._stages = stages
+        self._results = {}
+
+    def __getitem__(self, name):
+        stage = self._stages[name]
+        if name not in self._results:
+            dependency_results = {
+                dependency: self[dependency] for dependency in stage.depends}
+            try:
+                result = stage.finish(dependency_results)
+            except Exception as e:
+                raise StageError("Stage '%s' failed: %s" % (name, e)) from e
+            self._results[name] = result
+        return self._results[name]
+
+    def __contains__(self, name):
+        return name in self._stages
+
+    def __iter__(self):
+        return iter(self._stages)
+
+    def __len__(self):
+        return len(self._stages)
+
+
+class StagePipeline:
+    """Dispatch merged elements to a set of stages in a single pass."""
+
+    def __init__(self, pkg, stage_classes):
+        """
+        Constructor.
+
+        :param pkg: the :class:`Package` being parsed
+        :param stage_classes: :class:`Stage` subclasses to run
+        :raises: :exc:`InvalidStage`
+        """
+        self.stages = OrderedDict()
+        for stage_class in sort_stages(stage_classes):
+            dependencies = {
+                dependency: self.stages[dependency]
+                for dependency in stage_class.depends}
+            self.stages[stage_class.name] = stage_class(pkg, dependencies)
+        # skip the no-op visitors inherited from Stage
+        self._visitors = {
+            kind: [
+                getattr(stage, 'visit_' + kind) for stage in self.stages.values()
+                if getattr(type(stage), 'visit_' + kind) is not getattr(Stage, 'visit_' + kind)]
+            for kind in ELEMENT_KINDS}
+
+    def visit(self, kind, elements):
+        """
+        Pass elements to the visitors of all stages.
+
+        :param kind: one of ``ELEMENT_KINDS``, ``str``
+        :param elements: elements merged into the package
+        :raises: :exc:`StageError`
+        """
+        visitors = self._visitors[kind]
+        if not visitors:
+            return
+        for element in elements:
+            for visitor in visitors:
+                try:
+                    visitor(element)
+                except Exception as e:
+                    raise StageError("Stage '%s' failed visiting %s: %s" %
+                                     (visitor.__self__.name, kind, e)) from e
+
+    def results(self):
+        """Return the lazily computed :class:`StageResults`."""
+        return StageResults(self.stages)
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 from xml.etree import cElementTree as ElementTree
 
 from xmlschema import XMLSchemaValidationError
@@ -53,6 +54,7 @@ def default_preprocessor(xsd_schema, xml_document, xml_document_defaults,
     for chunk in iter_decoder:
         if isinstance(chunk, XMLSchemaValidationError):
             if chunk.reason.startswith('The content of element ') or \
+               chunk.reason.startswith('The child n.') or \
                chunk.reason.startswith('Unexpected child with tag '):
                 expecteds = chunk.expected
                 if expecteds:
@@ -60,13 +62,15 @@ def default_preprocessor(xsd_schema, xml_document, xml_document_defaults,
                         expecteds = [expecteds]
                     for i, expected in enumerate(expecteds):
                         index = chunk.index + i
-                        default_elem = defaults_data.find(expected.tag)
+                        # older xmlschema releases report the expected tag names
+                        expected_tag = getattr(expected, 'tag', expected)
+                        default_elem = defaults_data.find(expected_tag)
                         if default_elem is not None:
-                            chunk.elem.insert(index, default_elem)
+                            chunk.elem.insert(index, copy.deepcopy(default_elem))
                             yield chunk
                             return
                         else:
-                            missing_elem = ElementTree.Element(expected.tag)
+                            missing_elem = ElementTree.Element(expected_tag)
                             chunk.elem.insert(index, missing_elem)
                             yield chunk
                             return
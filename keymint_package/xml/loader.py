@@ -0,0 +1,158 @@
+# Copyright 2017 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import contextlib
+import mmap
+import os
+from xml.etree import cElementTree as ElementTree
+
+
+@contextlib.contextmanager
+def map_file(filename):
+    """
+    Map a file read-only into memory.
+
+    :param filename: path of the file to map, ``str``
+    :returns: context manager yielding a buffer with the file contents
+    :raises: :exc:`IOError`
+    """
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # empty files can not be mapped
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def parse_buffer(buffer):
+    """
+    Parse XML from a bytes-like object without copying it.
+
+    :param buffer: XML contents, bytes-like
+    :returns: root element of the parsed document
+    :raises: :exc:`xml.etree.ElementTree.ParseError`
+    """
+    parser = ElementTree.XMLParser()
+    parser.feed(buffer)
+    return parser.close()
+
+
+class _Document:
+    """Parsed document together with the file state it was read from."""
+
+    __slots__ = ['key', 'root', 'valid_schemas']
+
+    def __init__(self, key, root):
+        self.key = key
+        self.root = root
+        self.valid_schemas = set()
+
+
+class FileCache:
+    """
+    Cache of resolved paths and parsed XML documents.
+
+    Parsed documents are shared between all packages referencing the same
+    file and must be treated as read-only; copy them before modifying.
+    Every lookup stats the file and re-reads it once it changed on disk.
+    Documents stay cached until their file is looked up after being
+    removed, or until :meth:`clear` is called.
+    """
+
+    def __init__(self):
+        """Constructor."""
+        self._paths = {}
+        self._documents = {}
+
+    def clear(self):
+        """Forget all cached paths and documents."""
+        self._paths.clear()
+        self._documents.clear()
+
+    def resolve(self, path, name):
+        """
+        Resolve a file name relative to a package path.
+
+        :param path: base path of the package, ``str``
+        :param name: file name relative to ``path``, ``str``
+        :returns: normalized absolute path of the file, ``str``
+        """
+        key = (os.path.abspath(path), name)
+        try:
+            return self._paths[key]
+        except KeyError:
+            filename = os.path.realpath(os.path.join(*key))
+            self._paths[key] = filename
+            return filename
+
+    def _get_document(self, filename):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            # do not keep documents of files removed from disk
+            self._documents.pop(filename, None)
+            raise
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        document = self._documents.get(filename)
+        if document is None or document.key != key:
+            with map_file(filename) as buffer:
+                document = _Document(key, parse_buffer(buffer))
+            self._documents[filename] = document
+        return document
+
+    def parse(self, filename):
+        """
+        Return the shared, read-only root element of a resolved file.
+
+        :param filename: path as returned by :meth:`resolve`, ``str``
+        :returns: root element of the parsed document
+        :raises: :exc:`IOError`
+        :raises: :exc:`xml.etree.ElementTree.ParseError`
+        """
+        return self._get_document(filename).root
+
+    def is_valid(self, filename, root, schema_name):
+        """
+        Check if a shared root was already validated against a schema.
+
+        :param filename: path as returned by :meth:`resolve`, ``str``
+        :param root: root element as returned by :meth:`parse`
+        :param schema_name: name of the schema, ``str``
+        :returns: True if :meth:`set_valid` was called for this root
+        :rtype: bool
+        """
+        document = self._documents.get(filename)
+        return document is not None and document.root is root and \
+            schema_name in document.valid_schemas
+
+    def set_valid(self, filename, root, schema_name):
+        """
+        Record that a shared root is valid against a schema.
+
+        :param filename: path as returned by :meth:`resolve`, ``str``
+        :param root: root element as returned by :meth:`parse`
+        :param schema_name: name of the schema, ``str``
+        """
+        document = self._documents.get(filename)
+        if document is not None and document.root is root:
+            document.valid_schemas.add(schema_name)
+
+
+_file_cache = FileCache()
+
+
+def get_file_cache():
+    """Return the file cache shared by all parsed packages."""
+    return _file_cache
@@ -0,0 +1,151 @@
+# Copyright 2017 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+from xml.etree import cElementTree as ElementTree
+
+from keymint_package import load_document
+from keymint_package import parse_package
+from keymint_package.xml.loader import FileCache
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+
+
+def _permission(permission_path, defaults_path=None):
+    element = ElementTree.Element('permission')
+    ElementTree.SubElement(element, 'permission_path').text = permission_path
+    if defaults_path is not None:
+        ElementTree.SubElement(element, 'defaults_path').text = defaults_path
+    return element
+
+
+def test_packages_share_parsed_root():
+    with tempfile.TemporaryDirectory() as workspace:
+        shared = os.path.join(workspace, 'shared')
+        os.makedirs(shared)
+        shutil.copy(os.path.join(RESOURCES, 'governance1.xml'), shared)
+        for name in ['foo', 'bar']:
+            os.makedirs(os.path.join(workspace, name))
+        element = ElementTree.Element('governance')
+        ElementTree.SubElement(element, 'governance_path').text = \
+            os.path.join('..', 'shared', 'governance1.xml')
+
+        file_cache = FileCache()
+        foo_root = load_document(
+            file_cache, 'governance.xsd', os.path.join(workspace, 'foo'),
+            element, 'governance_path')
+        bar_root = load_document(
+            file_cache, 'governance.xsd', os.path.join(workspace, 'bar'),
+            element, 'governance_path')
+        assert foo_root is bar_root
+        assert foo_root is file_cache.parse(
+            file_cache.resolve(shared, 'governance1.xml'))
+
+        copied_root = load_document(
+            file_cache, 'governance.xsd', os.path.join(workspace, 'foo'),
+            element, 'governance_path', copy_document=True)
+        assert copied_root is not foo_root
+
+
+def test_defaults_do_not_modify_shared_roots():
+    file_cache = FileCache()
+    permissions_root = file_cache.parse(
+        file_cache.resolve(RESOURCES, 'permissions1.xml'))
+    defaults_root = file_cache.parse(
+        file_cache.resolve(RESOURCES, 'permissions_defaults.xml'))
+    permissions_xml = ElementTree.tostring(permissions_root)
+    defaults_xml = ElementTree.tostring(defaults_root)
+
+    element = _permission('permissions1.xml', 'permissions_defaults.xml')
+    first_root = load_document(
+        file_cache, 'permissions.xsd', RESOURCES, element, 'permission_path')
+    second_root = load_document(
+        file_cache, 'permissions.xsd', RESOURCES, element, 'permission_path')
+
+    assert first_root is not permissions_root
+    assert first_root is not second_root
+    assert ElementTree.tostring(permissions_root) == permissions_xml
+    assert ElementTree.tostring(defaults_root) == defaults_xml
+    first_subject = first_root.find("permissions/grant[@name='listener']/subject_name")
+    second_subject = second_root.find("permissions/grant[@name='listener']/subject_name")
+    assert first_subject is not None
+    assert first_subject is not second_subject
+    assert first_subject is not defaults_root.find('subject_name')
+
+
+def test_modified_file_is_reread():
+    with tempfile.TemporaryDirectory() as workspace:
+        filename = os.path.join(workspace, 'document.xml')
+        with open(filename, 'w') as f:
+            f.write('<b>1</b>')
+
+        file_cache = FileCache()
+        resolved = file_cache.resolve(workspace, 'document.xml')
+        root = file_cache.parse(resolved)
+        assert root.text == '1'
+        assert file_cache.parse(resolved) is root
+
+        with open(filename, 'w') as f:
+            f.write('<b>22</b>')
+        # make sure the change is visible on file systems with coarse timestamps
+        mtime_ns = os.stat(filename).st_mtime_ns + 1000000000
+        os.utime(filename, ns=(mtime_ns, mtime_ns))
+        assert file_cache.parse(resolved).text == '22'
+
+
+def test_removed_file_is_not_served():
+    with tempfile.TemporaryDirectory() as workspace:
+        filename = os.path.join(workspace, 'document.xml')
+        with open(filename, 'w') as f:
+            f.write('<b>1</b>')
+
+        file_cache = FileCache()
+        resolved = file_cache.resolve(workspace, 'document.xml')
+        assert file_cache.parse(resolved).text == '1'
+        os.remove(filename)
+        try:
+            file_cache.parse(resolved)
+        except OSError:
+            pass
+        else:
+            assert False, 'OSError not raised'
+
+
+def test_package_string_newlines():
+    with tempfile.TemporaryDirectory() as workspace:
+        package_path = os.path.join(workspace, 'package')
+        shutil.copytree(RESOURCES, package_path)
+        manifest = os.path.join(package_path, 'keymint_package.xml')
+        with open(manifest, 'r') as f:
+            data = f.read()
+        with open(manifest, 'w', newline='\r\n') as f:
+            f.write(data)
+
+        pkg = parse_package(package_path)
+        assert pkg.string == data
+
+
+def test_resolve_relative_path_after_chdir():
+    cwd = os.getcwd()
+    file_cache = FileCache()
+    try:
+        os.chdir(RESOURCES)
+        filename = file_cache.resolve('.', 'governance1.xml')
+        os.chdir(os.path.dirname(RESOURCES))
+        assert file_cache.resolve('.', 'governance1.xml') != filename
+        assert file_cache.resolve('resources', 'governance1.xml') == filename
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,158 @@
+# Copyright 2017 Open Source Robotics Foundation, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+from keymint_package import PACKAGE_MANIFEST_FILENAME
+from keymint_package import parse_package_string
+from keymint_package.exceptions import InvalidStage
+from keymint_package.exceptions import StageError
+from keymint_package.stages import register_stage
+from keymint_package.stages import sort_stages
+from keymint_package.stages import Stage
+from keymint_package.stages import StagePipeline
+from keymint_package.stages import unregister_stage
+
+RESOURCES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resources')
+
+
+def _raises(exception_type, func, *args):
+    try:
+        func(*args)
+    except exception_type as e:
+        return e
+    assert False, '%s not raised' % exception_type.__name__
+
+
+def _stage(name, depends=(), **attributes):
+    attributes.update(name=name, depends=depends)
+    return type('%sStage' % name, (Stage,), attributes)
+
+
+class CollectStage(Stage):
+
+    name = 'collect'
+
+    def __init__(self, pkg, dependencies):
+        super().__init__(pkg, dependencies)
+        self.elements = {'grant': [], 'domain_rule': [], 'identity': []}
+
+    def visit_grant(self, element):
+        self.elements['grant'].append(element)
+
+    def visit_domain_rule(self, element):
+        self.elements['domain_rule'].append(element)
+
+    def visit_identity(self, element):
+        self.elements['identity'].append(element)
+
+    def finish(self, results):
+        return self.elements
+
+
+def test_sort_stages():
+    first = _stage('first')
+    second = _stage('second', ('first',))
+    third = _stage('third', ['second', 'first'])
+    assert sort_stages([third, second, first]) == [first, second, third]
+
+
+def test_invalid_stages():
+    _raises(InvalidStage, sort_stages, [_stage('lonely', ('missing',))])
+    _raises(InvalidStage, sort_stages, [
+        _stage('chicken', ('egg',)), _stage('egg', ('chicken',))])
+    _raises(InvalidStage, sort_stages, [_stage('twin'), _stage('twin')])
+    _raises(InvalidStage, sort_stages, [_stage('index_user', 'index')])
+    _raises(InvalidStage, register_stage, object)
+    _raises(InvalidStage, register_stage, _stage(None))
+
+
+def test_register_stage():
+    stage = _stage('registered')
+    register_stage(stage)
+    try:
+        _raises(InvalidStage, register_stage, _stage('registered'))
+    finally:
+        unregister_stage('registered')
+
+
+def _parse_resources(stages):
+    with open(os.path.join(RESOURCES, PACKAGE_MANIFEST_FILENAME), 'r') as f:
+        data = f.read()
+    return parse_package_string(data, RESOURCES, stages=stages)
+
+
+def test_visitors_during_parse():
+    pkg = _parse_resources([CollectStage])
+    elements = pkg.stage_results['collect']
+    assert elements['grant'] == list(pkg.permissions)
+    assert elements['domain_rule'] == list(pkg.governance)
+    assert elements['identity'] == list(pkg.identities)
+    assert len(elements['grant']) == 3
+    assert len(elements['domain_rule']) == 2
+    assert len(elements['identity']) == 1
+
+
+def test_stages_without_visitors():
+    grants = []
+    idle = _stage('idle', finish=lambda self, results: 'finished')
+    grants_only = _stage(
+        'grants_only',
+        visit_grant=lambda self, element: grants.append(element),
+        finish=lambda self, results: grants)
+
+    pkg = _parse_resources([idle, grants_only])
+    assert pkg.stage_results['idle'] == 'finished'
+    assert pkg.stage_results['grants_only'] == list(pkg.permissions)
+
+
+def test_visitor_errors():
+    def visit_domain_rule(self, element):
+        element.attrib['missing']
+
+    broken = _stage('broken', visit_domain_rule=visit_domain_rule)
+    e = _raises(StageError, _parse_resources, [broken])
+    assert isinstance(e.__cause__, KeyError)
+    assert "'broken'" in str(e)
+
+
+def test_lazy_results():
+    calls = []
+
+    def finish(name, result):
+        def _finish(self, results):
+            calls.append(name)
+            return result(results)
+        return _finish
+
+    count = _stage('count', finish=finish('count', lambda results: 2))
+    double = _stage('double', ('count',), finish=finish(
+        'double', lambda results: results['count'] * 2))
+    broken = _stage('broken', finish=finish('broken', lambda results: {}['missing']))
+
+    results = StagePipeline(None, [double, count, broken]).results()
+    assert calls == []
+    assert 'double' in results
+    assert 'broken' in results
+    assert 'missing' not in results
+    assert calls == []
+
+    assert results['double'] == 4
+    assert calls == ['count', 'double']
+    assert results['double'] == 4
+    assert results['count'] == 2
+    assert calls == ['count', 'double']
+
+    _raises(StageError, results.get, 'broken')
+    _raises(KeyError, results.__getitem__, 'missing')